@@ -1,58 +1,97 @@
 """Multi-account API endpoints for IMAP Email Filter"""
-import json
 import os
-from fastapi import Body, HTTPException
+
+import orjson
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+
+class AccountEntry(BaseModel):
+    """Schema of one entry in accounts.json.
+
+    Typing the request body with this model lets Pydantic v2 validate the
+    raw bytes in one pass instead of json-parsing into a dict first.
+    """
+    email: str
+    password: str
+    imap_host: str
+    imap_port: int = 993
+    proxy: bool = True
 
 ACCOUNTS_FILE = os.path.join(os.path.dirname(__file__), 'accounts.json')
 
+# In-memory cache of accounts.json keyed on file mtime, so the hot path
+# (per-login proxy config lookups) costs a stat() instead of a full JSON parse.
+# _by_email indexes the cached list for O(1) lookups by account email, and
+# _cache["sanitized"] holds the password-masked listing so GET requests don't
+# rebuild it per call.
+_cache = {"mtime": None, "data": [], "by_email": {}, "sanitized": []}
+
+def _update_cache(accounts, mtime):
+    _cache["data"] = accounts
+    _cache["by_email"] = {acc["email"]: acc for acc in accounts}
+    _cache["sanitized"] = [{**acc, "password": "****"} for acc in accounts]
+    _cache["mtime"] = mtime
+
 def load_accounts():
-    if os.path.exists(ACCOUNTS_FILE):
-        with open(ACCOUNTS_FILE, 'r') as f:
-            return json.load(f)
-    return []
+    try:
+        mtime = os.stat(ACCOUNTS_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    if mtime == _cache["mtime"]:
+        return _cache["data"]
+    with open(ACCOUNTS_FILE, 'rb') as f:
+        accounts = orjson.loads(f.read())
+    _update_cache(accounts, mtime)
+    return accounts
 
 def save_accounts(accounts):
-    with open(ACCOUNTS_FILE, 'w') as f:
-        json.dump(accounts, f, indent=2)
+    with open(ACCOUNTS_FILE, 'wb') as f:
+        f.write(orjson.dumps(accounts, option=orjson.OPT_INDENT_2))
+    # Keep the cache current so writers never trigger a re-read.
+    _update_cache(accounts, os.stat(ACCOUNTS_FILE).st_mtime_ns)
+
+def get_account_by_email(email: str):
+    """Look up a single account by email via the cached index."""
+    load_accounts()  # refresh cache if the file changed
+    return _cache["by_email"].get(email)
 
 def get_proxy_config_for_user(username: str):
     """Get IMAP proxy configuration for specific user based on email."""
-    accounts = load_accounts()
-    for acc in accounts:
-        if acc["email"] == username:
-            return {
-                "upstream_host": acc["imap_host"],
-                "upstream_port": acc["imap_port"],
-                "upstream_ssl": acc.get("proxy", True)
-            }
-    return None
+    acc = get_account_by_email(username)
+    if acc is None:
+        return None
+    return {
+        "upstream_host": acc["imap_host"],
+        "upstream_port": acc["imap_port"],
+        "upstream_ssl": acc.get("proxy", True)
+    }
 
 def register_accounts_routes(app):
     """Register all account management routes with the FastAPI app."""
     
     @app.get("/api/config/accounts")
     async def get_accounts():
-        accounts = load_accounts()
+        load_accounts()  # refresh cache if the file changed
         # Don't return passwords in the list
-        return [{**acc, "password": "****"} for acc in accounts]
+        return _cache["sanitized"]
 
     @app.post("/api/config/account")
-    async def add_account(account: dict = Body(...)):
+    async def add_account(account: AccountEntry):
         accounts = load_accounts()
         # Check if account already exists
-        if any(acc["email"] == account["email"] for acc in accounts):
+        if account.email in _cache["by_email"]:
             raise HTTPException(status_code=400, detail="Account already exists")
-        accounts.append(account)
+        accounts.append(account.model_dump())
         save_accounts(accounts)
-        return {"success": True, "account": {**account, "password": "****"}}
+        return {"success": True, "account": {**account.model_dump(), "password": "****"}}
 
     @app.put("/api/config/account")
-    async def update_account(account: dict = Body(...)):
+    async def update_account(account: AccountEntry):
         accounts = load_accounts()
-        email = account.get("email")
         for i, acc in enumerate(accounts):
-            if acc["email"] == email:
-                accounts[i] = account
+            if acc["email"] == account.email:
+                accounts[i] = account.model_dump()
                 save_accounts(accounts)
                 return {"success": True}
         raise HTTPException(status_code=404, detail="Account not found")
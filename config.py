@@ -43,6 +43,7 @@ class OCRConfig:
     
     # PDF Processing
     MAX_PDF_SIZE_MB = int(os.getenv('MAX_PDF_SIZE_MB', '50'))
+    MAX_PDF_PAGES = int(os.getenv('MAX_PDF_PAGES', '200'))
     EXTRACT_IMAGES = os.getenv('EXTRACT_IMAGES', 'True').lower() == 'true'
 
 
@@ -59,6 +60,8 @@ class FilterConfig:
     # Attachment Settings
     ALLOWED_EXTENSIONS = ['.pdf', '.PDF']
     MIN_ATTACHMENT_SIZE_KB = int(os.getenv('MIN_ATTACHMENT_SIZE_KB', '1'))
+    MAX_ATTACHMENTS = int(os.getenv('MAX_ATTACHMENTS', '10'))
+    MAX_TOTAL_ATTACHMENT_MB = int(os.getenv('MAX_TOTAL_ATTACHMENT_MB', '100'))
 
 
 class AppConfig:
@@ -68,6 +71,7 @@ class AppConfig:
     OUTPUT_DIR = os.getenv('OUTPUT_DIR', 'output')
     LOGS_DIR = os.getenv('LOGS_DIR', 'logs')
     TEMP_DIR = os.getenv('TEMP_DIR', 'temp')
+    CACHE_DIR = os.getenv('CACHE_DIR', 'cache')
     
     # Logging Settings
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -99,6 +103,7 @@ def validate_config():
     os.makedirs(AppConfig.OUTPUT_DIR, exist_ok=True)
     os.makedirs(AppConfig.LOGS_DIR, exist_ok=True)
     os.makedirs(AppConfig.TEMP_DIR, exist_ok=True)
+    os.makedirs(AppConfig.CACHE_DIR, exist_ok=True)
     
     print("Configuration validated successfully")
 
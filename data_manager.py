@@ -4,24 +4,73 @@ Handles data storage, organization, and file management
 for processed emails and extracted information.
 """
 
+import atexit
 import os
 import json
+import itertools
 import logging
+import threading
+import time
 from datetime import datetime
 from typing import Dict, List, Optional
 import shutil
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from config import AppConfig
+from io_writer import BatchFileWriter
 
 
 class DataManager:
     """Data storage and organization manager"""
-    
+
+    # Maps every filesystem-unsafe character to '_' in one translate pass
+    _UNSAFE_TABLE = str.maketrans({c: '_' for c in '<>:"/\\|?*'})
+
+    # Extracted-text records buffered before an append to the run's
+    # JSONL stream
+    _TEXT_BATCH_SIZE = 32
+
     def __init__(self):
         """Initialize data manager"""
         self.logger = logging.getLogger(__name__)
         self.output_dir = AppConfig.OUTPUT_DIR
+        self._ts_fmt = "%Y%m%d_%H%M%S"
+        self._counter = itertools.count()
+        # Writes go through a background thread so the processing loop is
+        # not serialized on per-file disk latency
+        self._writer = BatchFileWriter()
+        # Extracted text for a run accumulates into one JSONL stream —
+        # one file handle and one append per batch instead of an
+        # open/write/close per document
+        self._text_stream_name = f"extracted_{time.strftime(self._ts_fmt)}.jsonl"
+        self._text_records = []
+        self._text_lock = threading.Lock()
         self.ensure_directories()
+
+    def _make_timestamp(self) -> str:
+        """Return a unique timestamp prefix for output filenames
+
+        A monotonic counter is appended because second-resolution timestamps
+        collide when several files are saved within the same second, which
+        silently overwrote earlier output.
+        """
+        return f"{time.strftime(self._ts_fmt)}_{next(self._counter):06d}"
+
+    def _write_json(self, data: Dict, out_name: str, category: str):
+        """Serialize data to a JSON file in an output category directory
+
+        Uses orjson when available (several times faster and writes utf-8
+        bytes directly); falls back to stdlib json otherwise.
+        """
+        if orjson is not None:
+            payload = orjson.dumps(data, option=orjson.OPT_INDENT_2, default=str)
+        else:
+            payload = json.dumps(data, indent=2, default=str)
+        self._writer.submit_write(out_name, payload, dir_fd=self._dir_fds[category])
     
     def ensure_directories(self):
         """Create necessary directories if they don't exist"""
@@ -38,6 +87,26 @@ class DataManager:
         for directory in directories:
             os.makedirs(directory, exist_ok=True)
             self.logger.debug(f"Ensured directory exists: {directory}")
+
+        # Keep one fd open per output category so each save resolves the
+        # filename relative to an already-opened directory instead of
+        # walking output_dir/<category>/ through the kernel every time
+        self._dir_fds = {
+            category: os.open(
+                os.path.join(self.output_dir, category),
+                os.O_RDONLY | os.O_DIRECTORY
+            )
+            for category in ('pdfs', 'text', 'json', 'invoices')
+        }
+        atexit.register(self._close_dir_fds)
+
+    def _close_dir_fds(self):
+        for fd in self._dir_fds.values():
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._dir_fds = {}
     
     def save_pdf(self, pdf_data: bytes, filename: str) -> Optional[str]:
         """Save PDF file
@@ -50,51 +119,129 @@ class DataManager:
             Saved file path or None
         """
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = self._make_timestamp()
             safe_filename = self._sanitize_filename(filename)
-            output_path = os.path.join(
-                self.output_dir, 
-                'pdfs', 
-                f"{timestamp}_{safe_filename}"
-            )
-            
-            with open(output_path, 'wb') as f:
-                f.write(pdf_data)
-            
+            out_name = f"{timestamp}_{safe_filename}"
+            output_path = os.path.join(self.output_dir, 'pdfs', out_name)
+
+            self._writer.submit_write(out_name, pdf_data, dir_fd=self._dir_fds['pdfs'])
+
             self.logger.info(f"Saved PDF to {output_path}")
             return output_path
         except Exception as e:
             self.logger.error(f"Error saving PDF: {e}")
             return None
     
-    def save_extracted_text(self, text: str, filename: str) -> Optional[str]:
-        """Save extracted text
-        
+    def save_pdf_stream(self, src_fileobj, filename: str) -> Optional[str]:
+        """Stream a PDF to disk from a file-like source
+
+        Avoids materializing the whole document in memory: sources with a
+        real file descriptor are relayed zero-copy via os.sendfile, others
+        are copied in 1 MiB chunks.
+
         Args:
-            text: Extracted text content
+            src_fileobj: Readable binary file-like positioned at the start
             filename: Original filename
-            
+
         Returns:
             Saved file path or None
         """
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = self._make_timestamp()
             safe_filename = self._sanitize_filename(filename)
-            base_name = os.path.splitext(safe_filename)[0]
-            output_path = os.path.join(
-                self.output_dir,
-                'text',
-                f"{timestamp}_{base_name}.txt"
+            out_name = f"{timestamp}_{safe_filename}"
+            output_path = os.path.join(self.output_dir, 'pdfs', out_name)
+
+            dst_fd = os.open(
+                out_name,
+                os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                0o644,
+                dir_fd=self._dir_fds['pdfs']
             )
-            
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(text)
-            
-            self.logger.info(f"Saved extracted text to {output_path}")
+            try:
+                try:
+                    src_fd = src_fileobj.fileno()
+                except (AttributeError, OSError):
+                    src_fd = None
+
+                if src_fd is not None:
+                    size = os.fstat(src_fd).st_size
+                    offset = 0
+                    while offset < size:
+                        sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+                        if sent == 0:
+                            break
+                        offset += sent
+                else:
+                    with open(dst_fd, 'wb', closefd=False) as dst:
+                        shutil.copyfileobj(src_fileobj, dst, length=1 << 20)
+            finally:
+                os.close(dst_fd)
+
+            self.logger.info(f"Saved PDF to {output_path}")
             return output_path
+        except Exception as e:
+            self.logger.error(f"Error saving PDF stream: {e}")
+            return None
+
+    def save_extracted_text(self, text: str, filename: str) -> Optional[str]:
+        """Save extracted text to the run's JSONL stream
+
+        Records buffer in memory and append to one shared file in
+        batches, so hundreds of documents cost a handful of appends
+        instead of an open/write/close each. One line per document:
+        {"timestamp", "filename", "text"}.
+
+        Args:
+            text: Extracted text content
+            filename: Original filename
+
+        Returns:
+            Path of the shared JSONL stream, or None
+        """
+        try:
+            record = {
+                'timestamp': self._make_timestamp(),
+                'filename': filename,
+                'text': text
+            }
+            if orjson is not None:
+                payload = orjson.dumps(record) + b'\n'
+            else:
+                payload = (json.dumps(record) + '\n').encode('utf-8')
+
+            with self._text_lock:
+                self._text_records.append(payload)
+                flush_now = len(self._text_records) >= self._TEXT_BATCH_SIZE
+            if flush_now:
+                self._flush_text_records()
+
+            return os.path.join(self.output_dir, 'text', self._text_stream_name)
         except Exception as e:
             self.logger.error(f"Error saving text: {e}")
             return None
+
+    def _flush_text_records(self):
+        """Append all buffered text records to the stream in one write"""
+        with self._text_lock:
+            records = self._text_records
+            self._text_records = []
+        if not records:
+            return
+        try:
+            fd = os.open(
+                self._text_stream_name,
+                os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+                0o644,
+                dir_fd=self._dir_fds['text']
+            )
+            try:
+                os.write(fd, b''.join(records))
+            finally:
+                os.close(fd)
+            self.logger.info(f"Flushed {len(records)} text records")
+        except OSError as e:
+            self.logger.error(f"Error flushing text records: {e}")
     
     def save_invoice_data(self, invoice_data: Dict, filename: str) -> Optional[str]:
         """Save parsed invoice data as JSON
@@ -107,18 +254,14 @@ class DataManager:
             Saved file path or None
         """
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = self._make_timestamp()
             safe_filename = self._sanitize_filename(filename)
             base_name = os.path.splitext(safe_filename)[0]
-            output_path = os.path.join(
-                self.output_dir,
-                'invoices',
-                f"{timestamp}_{base_name}.json"
-            )
-            
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(invoice_data, f, indent=2, default=str)
-            
+            out_name = f"{timestamp}_{base_name}.json"
+            output_path = os.path.join(self.output_dir, 'invoices', out_name)
+
+            self._write_json(invoice_data, out_name, 'invoices')
+
             self.logger.info(f"Saved invoice data to {output_path}")
             return output_path
         except Exception as e:
@@ -135,16 +278,12 @@ class DataManager:
             Saved file path or None
         """
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_path = os.path.join(
-                self.output_dir,
-                'json',
-                f"email_metadata_{timestamp}.json"
-            )
-            
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, indent=2, default=str)
-            
+            timestamp = self._make_timestamp()
+            out_name = f"email_metadata_{timestamp}.json"
+            output_path = os.path.join(self.output_dir, 'json', out_name)
+
+            self._write_json(metadata, out_name, 'json')
+
             return output_path
         except Exception as e:
             self.logger.error(f"Error saving email metadata: {e}")
@@ -159,11 +298,7 @@ class DataManager:
         Returns:
             Sanitized filename
         """
-        # Remove or replace unsafe characters
-        unsafe_chars = '<>:"/\\|?*'
-        for char in unsafe_chars:
-            filename = filename.replace(char, '_')
-        return filename[:200]  # Limit length
+        return filename.translate(self._UNSAFE_TABLE)[:200]  # Limit length
     
     def create_summary_report(self, processed_count: int, failed_count: int) -> Optional[str]:
         """Create a summary report of processing
@@ -176,23 +311,28 @@ class DataManager:
             Report file path or None
         """
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = self._make_timestamp()
             report_path = os.path.join(
                 self.output_dir,
                 f"processing_summary_{timestamp}.txt"
             )
             
-            report = f"""Email Processing Summary
-            ============================
-            Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-            
-            Successfully Processed: {processed_count}
-            Failed: {failed_count}
-            Total: {processed_count + failed_count}
-            """
-            
-            with open(report_path, 'w') as f:
-                f.write(report)
+            report = (
+                "Email Processing Summary\n"
+                "============================\n"
+                f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                "\n"
+                f"Successfully Processed: {processed_count}\n"
+                f"Failed: {failed_count}\n"
+                f"Total: {processed_count + failed_count}\n"
+            )
+
+            # One unbuffered write; no BufferedWriter setup for a tiny file
+            fd = os.open(report_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                os.write(fd, report.encode())
+            finally:
+                os.close(fd)
             
             self.logger.info(f"Created summary report: {report_path}")
             return report_path
@@ -200,16 +340,37 @@ class DataManager:
             self.logger.error(f"Error creating summary report: {e}")
             return None
     
+    def flush_pending_writes(self):
+        """Block until all queued and buffered writes have completed"""
+        self._flush_text_records()
+        self._writer.flush()
+
     def cleanup_temp_files(self):
         """Clean up temporary files"""
+        self.flush_pending_writes()
+        try:
+            # Hold the directory fd open and unlink relative to it, so the
+            # kernel resolves each entry against the already-opened inode
+            # instead of re-walking the full path per file
+            dir_fd = os.open(AppConfig.TEMP_DIR, os.O_RDONLY | os.O_DIRECTORY)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            self.logger.error(f"Error opening temp dir: {e}")
+            return
+
         try:
-            if os.path.exists(AppConfig.TEMP_DIR):
-                for file in os.listdir(AppConfig.TEMP_DIR):
-                    file_path = os.path.join(AppConfig.TEMP_DIR, file)
-                    os.remove(file_path)
-                self.logger.info("Cleaned up temporary files")
+            # scandir straight from the fd: one open covers the listing and
+            # every unlink, with no re-walk of the path and no TOCTOU window
+            with os.scandir(dir_fd) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False):
+                        os.unlink(entry.name, dir_fd=dir_fd)
+            self.logger.info("Cleaned up temporary files")
         except Exception as e:
             self.logger.error(f"Error cleaning up temp files: {e}")
+        finally:
+            os.close(dir_fd)
 
 
 if __name__ == '__main__':
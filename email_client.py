@@ -6,6 +6,11 @@ and mailbox operations for the email filtering system.
 
 import imaplib
 import email
+import functools
+import re
+import socket
+import zlib
+from collections import deque
 from email.header import decode_header
 import logging
 from typing import List, Dict, Tuple, Optional
@@ -14,9 +19,68 @@ import time
 from config import IMAPConfig, FilterConfig
 
 
+class _DeflateReader:
+    """File-like reader that inflates a COMPRESS=DEFLATE IMAP stream
+
+    Substituted for imaplib's socket file object once compression is
+    negotiated; read/readline see the same plaintext protocol as before.
+    """
+
+    def __init__(self, sock):
+        self._sock = sock
+        self._decompressor = zlib.decompressobj(-15)
+        self._buffer = bytearray()
+
+    def _fill(self) -> bool:
+        data = self._sock.recv(65536)
+        if not data:
+            return False
+        self._buffer += self._decompressor.decompress(data)
+        return True
+
+    def read(self, size: int) -> bytes:
+        while len(self._buffer) < size:
+            if not self._fill():
+                break
+        result = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return result
+
+    def readline(self, size: int = -1) -> bytes:
+        # imaplib calls readline(_MAXLINE + 1) and treats a returned line
+        # of exactly that length with no newline as an overrun, so the
+        # size cap must be honored, not just accepted
+        while True:
+            idx = self._buffer.find(b'\n')
+            if idx >= 0:
+                end = idx + 1
+                if 0 <= size < end:
+                    end = size
+                break
+            if 0 <= size <= len(self._buffer):
+                end = size
+                break
+            if not self._fill():
+                end = len(self._buffer)
+                break
+        result = bytes(self._buffer[:end])
+        del self._buffer[:end]
+        return result
+
+    def close(self):
+        pass
+
+
 class EmailClient:
     """IMAP email client for connecting and fetching emails"""
-    
+
+    # Matches the sequence number at the start of a FETCH response item
+    _FETCH_ID_PATTERN = re.compile(rb'^(\d+)\s')
+
+    # Lowercased once so the attachment check is a single case-insensitive
+    # endswith against a tuple instead of a per-attachment generator loop
+    _ALLOWED_EXT = tuple(e.lower() for e in FilterConfig.ALLOWED_EXTENSIONS)
+
     def __init__(self):
         """Initialize the email client with configuration settings"""
         self.server = IMAPConfig.IMAP_SERVER
@@ -24,6 +88,7 @@ class EmailClient:
         self.email_address = IMAPConfig.EMAIL_ADDRESS
         self.password = IMAPConfig.EMAIL_PASSWORD
         self.connection = None
+        self._has_move = False
         self.logger = logging.getLogger(__name__)
     
     def connect(self) -> bool:
@@ -32,6 +97,17 @@ class EmailClient:
         Returns:
             bool: True if connection successful, False otherwise
         """
+        # Reuse a live connection across polling runs: the TLS + IMAP
+        # handshake dominates wall time for short metadata-only scans
+        if self.connection is not None:
+            try:
+                status, _ = self.connection.noop()
+                if status == 'OK':
+                    return True
+            except Exception:
+                pass
+            self.connection = None
+
         try:
             if IMAPConfig.USE_SSL:
                 self.connection = imaplib.IMAP4_SSL(
@@ -48,6 +124,23 @@ class EmailClient:
             
             # Login to the server
             self.connection.login(self.email_address, self.password)
+            # imaplib caches the pre-auth capability set and login() never
+            # refreshes it; many servers (gmail included) only advertise
+            # MOVE and COMPRESS=DEFLATE after authentication, so re-ask
+            # before probing for either
+            try:
+                status, data = self.connection.capability()
+                if status == 'OK' and data and data[-1]:
+                    self.connection.capabilities = tuple(
+                        data[-1].decode('ascii', 'ignore').upper().split()
+                    )
+            except Exception as e:
+                self.logger.warning(f"Capability refresh failed: {e}")
+            # RFC 6851 MOVE collapses copy+store+expunge into one command
+            self._has_move = 'MOVE' in self.connection.capabilities
+            # RFC 4978 DEFLATE roughly halves bytes on header-heavy FETCHes
+            if 'COMPRESS=DEFLATE' in self.connection.capabilities:
+                self._enable_compression()
             self.logger.info(f"Successfully connected to {self.server}")
             return True
             
@@ -55,6 +148,34 @@ class EmailClient:
             self.logger.error(f"Failed to connect to IMAP server: {e}")
             return False
     
+    def _enable_compression(self):
+        """Negotiate COMPRESS=DEFLATE and wrap the transport (RFC 4978)
+
+        After the server acknowledges the command, every byte in both
+        directions is raw-deflate: outgoing data goes through a compressor
+        with a sync flush per send, incoming data through _DeflateReader.
+        """
+        try:
+            status, _ = self.connection.xatom('COMPRESS', 'DEFLATE')
+            if status != 'OK':
+                return
+            compressor = zlib.compressobj(
+                zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15
+            )
+            connection = self.connection
+            sock = connection.sock
+
+            def compressed_send(data):
+                payload = compressor.compress(data)
+                payload += compressor.flush(zlib.Z_SYNC_FLUSH)
+                sock.sendall(payload)
+
+            connection.file = _DeflateReader(sock)
+            connection.send = compressed_send
+            self.logger.info("Enabled COMPRESS=DEFLATE")
+        except Exception as e:
+            self.logger.warning(f"Could not enable compression: {e}")
+
     def disconnect(self):
         """Disconnect from the IMAP server"""
         try:
@@ -64,6 +185,59 @@ class EmailClient:
                 self.logger.info("Disconnected from IMAP server")
         except Exception as e:
             self.logger.error(f"Error disconnecting: {e}")
+        finally:
+            self.connection = None
+
+    def idle(self, timeout: float = 300) -> bool:
+        """Wait for the server to announce new mail (RFC 2177 IDLE)
+
+        Replaces fixed-interval polling: the call blocks inside one IDLE
+        command until an untagged EXISTS arrives or the timeout elapses,
+        so new-mail latency drops from the poll interval to near-zero.
+        Falls back immediately when the server lacks the capability, in
+        which case the caller should keep its polling interval.
+
+        Args:
+            timeout: Maximum seconds to wait for new mail
+
+        Returns:
+            bool: True if new mail was announced before the timeout
+        """
+        if 'IDLE' not in self.connection.capabilities:
+            return False
+
+        try:
+            tag = self.connection._new_tag()
+            self.connection.send(tag + b' IDLE\r\n')
+            if not self.connection.readline().startswith(b'+'):
+                self.logger.warning("Server rejected IDLE")
+                return False
+
+            new_mail = False
+            self.connection.sock.settimeout(timeout)
+            try:
+                while True:
+                    line = self.connection.readline()
+                    if not line:
+                        break
+                    if b'EXISTS' in line:
+                        new_mail = True
+                        break
+            except (socket.timeout, TimeoutError):
+                pass
+            finally:
+                self.connection.sock.settimeout(IMAPConfig.TIMEOUT)
+
+            self.connection.send(b'DONE\r\n')
+            # Drain until the tagged completion of the IDLE command
+            while True:
+                line = self.connection.readline()
+                if not line or line.startswith(tag):
+                    break
+            return new_mail
+        except Exception as e:
+            self.logger.error(f"Error during IDLE: {e}")
+            return False
     
     def select_folder(self, folder: str = None) -> bool:
         """Select a mailbox folder
@@ -107,6 +281,30 @@ class EmailClient:
             self.logger.error(f"Error searching emails: {e}")
             return []
     
+    def search_with_attachments(self, unread_only: bool = True) -> List[bytes]:
+        """Search for emails likely to carry PDF attachments
+
+        Incomplete by construction: RFC 3501 HEADER matches only the
+        top-level header section, and a typical PDF-carrying message is
+        multipart/* at the top level with Content-Type: application/pdf
+        and Content-Disposition only on the inner part, so this search
+        misses most real attachments. Use it only as an additive hint —
+        union the result with an unfiltered search (e.g. UNSEEN) rather
+        than fetching from it alone. A complete server-side filter needs
+        BODYSTRUCTURE inspection, which this client does not do yet.
+
+        Args:
+            unread_only: Restrict the search to unseen messages
+
+        Returns:
+            List of matching email IDs
+        """
+        criteria = ('(OR HEADER "Content-Type" "application/pdf"'
+                    ' HEADER "Content-Disposition" "attachment")')
+        if unread_only:
+            criteria = f'(UNSEEN {criteria})'
+        return self.search_emails(criteria)
+
     def fetch_email(self, email_id: bytes) -> Optional[email.message.Message]:
         """Fetch a single email by ID
         
@@ -127,6 +325,41 @@ class EmailClient:
             self.logger.error(f"Error fetching email {email_id}: {e}")
             return None
     
+    def fetch_emails(self, email_ids: List[bytes], chunk: int = 200) -> Dict[bytes, email.message.Message]:
+        """Fetch multiple emails in batched FETCH round-trips
+
+        Sends comma-separated sequence sets so a mailbox of N emails costs
+        N/chunk round-trips instead of N. Uses BODY.PEEK[] rather than RFC822
+        so fetching does not implicitly set the \\Seen flag.
+
+        Args:
+            email_ids: Email IDs to fetch
+            chunk: Maximum number of IDs per FETCH command
+
+        Returns:
+            Dictionary mapping email ID to parsed message object
+        """
+        messages = {}
+
+        for i in range(0, len(email_ids), chunk):
+            seq_set = b','.join(email_ids[i:i + chunk])
+            try:
+                status, msg_data = self.connection.fetch(seq_set, '(BODY.PEEK[])')
+                if status != 'OK':
+                    self.logger.warning(f"Batch fetch returned {status}")
+                    continue
+                for item in msg_data:
+                    if not isinstance(item, tuple) or len(item) < 2:
+                        continue
+                    match = self._FETCH_ID_PATTERN.match(item[0])
+                    if match:
+                        messages[match.group(1)] = email.message_from_bytes(item[1])
+            except Exception as e:
+                self.logger.error(f"Error batch-fetching emails: {e}")
+
+        self.logger.info(f"Fetched {len(messages)} of {len(email_ids)} emails in batches")
+        return messages
+
     def get_email_metadata(self, msg: email.message.Message) -> Dict:
         """Extract metadata from an email message
         
@@ -157,47 +390,73 @@ class EmailClient:
         if not header:
             return ''
         
-        decoded_parts = decode_header(header)
-        decoded_string = ''
-        
-        for part, encoding in decoded_parts:
+        # Accumulate in a list and join once; += on str re-copies the whole
+        # accumulated string per part, which is quadratic on multi-encoded
+        # headers
+        parts = []
+        for part, encoding in decode_header(header):
             if isinstance(part, bytes):
                 try:
-                    decoded_string += part.decode(encoding or 'utf-8')
-                except:
-                    decoded_string += part.decode('utf-8', errors='ignore')
+                    parts.append(part.decode(encoding or 'utf-8'))
+                except (LookupError, UnicodeDecodeError):
+                    parts.append(part.decode('utf-8', errors='ignore'))
             else:
-                decoded_string += str(part)
-        
-        return decoded_string
+                parts.append(str(part))
+
+        return ''.join(parts)
     
     def get_attachments(self, msg: email.message.Message) -> List[Dict]:
         """Extract attachments from an email message
-        
+
+        Walks the MIME tree breadth-first with an explicit queue so the
+        scan can stop as soon as the attachment count or cumulative size
+        cap is hit, and skips inline parts (images in newsletters) by
+        disposition. The base64 decode is deferred behind 'payload_fn',
+        so parts that are never consumed are never decoded.
+
         Args:
             msg: Email message object
-            
+
         Returns:
-            List of attachment dictionaries with filename and payload
+            List of attachment dictionaries with filename and a
+            zero-argument 'payload_fn' that decodes the payload on call
         """
         attachments = []
-        
-        for part in msg.walk():
+        total_size = 0
+        size_cap = FilterConfig.MAX_TOTAL_ATTACHMENT_MB * 1024 * 1024
+
+        parts = deque([msg])
+        while parts:
+            part = parts.popleft()
             if part.get_content_maintype() == 'multipart':
+                parts.extend(part.get_payload())
                 continue
+            # Accept both attachment and inline dispositions: some
+            # clients (Apple Mail) attach everything as inline, and the
+            # filename/extension check below already rejects inline
+            # images, which never decode thanks to the lazy payload_fn
             if part.get('Content-Disposition') is None:
                 continue
-            
+
             filename = part.get_filename()
-            if filename:
-                # Check if file extension is allowed
-                if any(filename.endswith(ext) for ext in FilterConfig.ALLOWED_EXTENSIONS):
-                    attachments.append({
-                        'filename': self._decode_header(filename),
-                        'payload': part.get_payload(decode=True),
-                        'content_type': part.get_content_type()
-                    })
-        
+            if not filename or not filename.lower().endswith(self._ALLOWED_EXT):
+                continue
+
+            # The still-encoded payload length is a close-enough proxy
+            # for decoded size without paying for the decode here
+            total_size += len(part.get_payload() or '')
+            attachments.append({
+                'filename': self._decode_header(filename),
+                'payload_fn': functools.partial(part.get_payload, decode=True),
+                'content_type': part.get_content_type()
+            })
+            if len(attachments) >= FilterConfig.MAX_ATTACHMENTS:
+                self.logger.warning("Attachment count cap reached; stopping scan")
+                break
+            if total_size >= size_cap:
+                self.logger.warning("Attachment size cap reached; stopping scan")
+                break
+
         self.logger.info(f"Found {len(attachments)} attachments")
         return attachments
     
@@ -211,18 +470,43 @@ class EmailClient:
         Returns:
             bool: True if successful
         """
+        return self.move_emails([email_id], destination_folder)
+
+    def move_emails(self, email_ids: List[bytes], destination_folder: str) -> bool:
+        """Move a batch of emails to a different folder
+
+        Uses the MOVE extension (one round-trip for the whole sequence set)
+        when the server advertises it; otherwise falls back to one COPY and
+        one STORE over the set with a single expunge at the end, instead of
+        three round-trips plus an expunge per message.
+
+        Args:
+            email_ids: Email IDs to move
+            destination_folder: Destination folder name
+
+        Returns:
+            bool: True if successful
+        """
+        if not email_ids:
+            return True
+
+        seq_set = b','.join(email_ids).decode()
         try:
-            # Copy to destination
-            result = self.connection.copy(email_id, destination_folder)
-            if result[0] == 'OK':
+            if self._has_move:
+                status, _ = self.connection.xatom('MOVE', seq_set, destination_folder)
+                if status != 'OK':
+                    return False
+            else:
+                result = self.connection.copy(seq_set, destination_folder)
+                if result[0] != 'OK':
+                    return False
                 # Mark as deleted in current folder
-                self.connection.store(email_id, '+FLAGS', '\\Deleted')
+                self.connection.store(seq_set, '+FLAGS', '\\Deleted')
                 self.connection.expunge()
-                self.logger.info(f"Moved email {email_id} to {destination_folder}")
-                return True
-            return False
+            self.logger.info(f"Moved {len(email_ids)} emails to {destination_folder}")
+            return True
         except Exception as e:
-            self.logger.error(f"Error moving email: {e}")
+            self.logger.error(f"Error moving emails: {e}")
             return False
     
     def mark_as_read(self, email_id: bytes) -> bool:
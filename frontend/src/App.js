@@ -26,6 +26,20 @@ function App() {
       setLoading(false);
     }
   };
+  const handleSelect = async (email) => {
+    // The list response is metadata-only; fetch the detail endpoint to
+    // get the base64 content the editor needs
+    setSelectedEmail(email);
+    try {
+      const response = await fetch(`${API_URL}/quarantine/${email.id}`);
+      if (!response.ok) throw new Error('Failed to fetch email content');
+      const data = await response.json();
+      setSelectedEmail(data);
+      setError(null);
+    } catch (err) {
+      setError(err.message);
+    }
+  };
   const handleApprove = async (id) => {
     try {
       const response = await fetch(`${API_URL}/quarantine/${id}/approve`, {
@@ -89,7 +103,7 @@ function App() {
           ) : (
             <ul>
               {Object.values(emails).map((email) => (
-                <li key={email.id} className={selectedEmail?.id === email.id ? 'selected' : ''} onClick={() => setSelectedEmail(email)}>
+                <li key={email.id} className={selectedEmail?.id === email.id ? 'selected' : ''} onClick={() => handleSelect(email)}>
                   <div className="email-item">
                     <div className="email-from">{email.meta?.sender}</div>
                     <div className="email-subject">{email.meta?.subject}</div>
@@ -116,7 +130,7 @@ function App() {
                 ) : (
                   <div className="actions">
                     <button onClick={() => handleApprove(selectedEmail.id)} className="btn btn-approve">✅ Approve &amp; Deliver</button>
-                    <button onClick={() => setEditMode(true)} className="btn btn-edit">✏️ Edit Content</button>
+                    <button onClick={() => setEditMode(true)} disabled={selectedEmail.content === undefined} className="btn btn-edit">✏️ Edit Content</button>
                     <button onClick={() => handleDelete(selectedEmail.id)} className="btn btn-delete">🗑️ Delete</button>
                   </div>
                 )}
@@ -4,12 +4,107 @@ This module handles parsing and extracting structured data
 from invoice documents using pattern matching and regex.
 """
 
+import os
 import re
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Optional
 from datetime import datetime
 import json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Patterns are compiled once at import; the extract_* methods run per invoice
+# and would otherwise pay re-compilation/flag parsing on every call.
+_INVOICE_NUMBER_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'invoice\s*#?\s*:?\s*([A-Z0-9\-]+)',
+    r'inv\s*#?\s*:?\s*([A-Z0-9\-]+)',
+    r'invoice\s*number\s*:?\s*([A-Z0-9\-]+)',
+    r'#\s*([A-Z0-9\-]{5,})',
+)]
+
+_DATE_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'date\s*:?\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
+    r'invoice\s*date\s*:?\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
+    r'(\d{1,2}[/-]\d{1,2}[/-]\d{4})',
+)]
+
+_TOTAL_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'total\s*:?\s*\$?([0-9,]+\.\d{2})',
+    r'amount\s*due\s*:?\s*\$?([0-9,]+\.\d{2})',
+    r'grand\s*total\s*:?\s*\$?([0-9,]+\.\d{2})',
+    r'balance\s*due\s*:?\s*\$?([0-9,]+\.\d{2})',
+)]
+
+# The value classes deliberately exclude newlines: with \s in the class the
+# quantifier overlapped the (?:\n|\r) terminator, which both let "vendors"
+# span lines and backtracked pathologically on long unterminated text.
+_VENDOR_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'from\s*:?\s*([A-Za-z0-9 \t&.,]+)(?:\n|\r)',
+    r'vendor\s*:?\s*([A-Za-z0-9 \t&.,]+)(?:\n|\r)',
+    r'billed\s*by\s*:?\s*([A-Za-z0-9 \t&.,]+)(?:\n|\r)',
+)]
+
+_TAX_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'tax\s*:?\s*\$?([0-9,]+\.\d{2})',
+    r'vat\s*:?\s*\$?([0-9,]+\.\d{2})',
+    r'sales\s*tax\s*:?\s*\$?([0-9,]+\.\d{2})',
+)]
+
+# Description stays on one line; the old [A-Za-z0-9\s\-]+ class overlapped the
+# following \s+ separators, causing quadratic backtracking and descriptions
+# that swallowed preceding lines.
+_LINE_ITEM_PATTERN = re.compile(r'([A-Za-z0-9\-][A-Za-z0-9 \-]*)[ \t]+(\d+)[ \t]+\$?([0-9,]+\.\d{2})')
+
+# Strips thousands separators in one C-level pass per amount
+_DECOMMA = str.maketrans('', '', ',')
+
+# One scan finds either a currency code or a symbol; replaces five substring
+# sweeps plus a full-document .upper() copy
+_CURRENCY_PATTERN = re.compile(r'\b(USD|EUR|GBP|CAD|AUD)\b|([€£$])', re.IGNORECASE)
+
+_SYMBOL_CURRENCY = {'$': 'USD', '€': 'EUR', '£': 'GBP'}
+
+# All scalar fields fused into one alternation so parse_invoice scans the text
+# once instead of once per field. Alternatives keep the same relative order as
+# the per-field pattern lists above; the first hit per field wins.
+_FUSED_FIELDS = re.compile(
+    r'invoice\s*#?\s*:?\s*(?P<inv1>[A-Z0-9\-]+)'
+    r'|inv\s*#?\s*:?\s*(?P<inv2>[A-Z0-9\-]+)'
+    r'|invoice\s*number\s*:?\s*(?P<inv3>[A-Z0-9\-]+)'
+    r'|#\s*(?P<inv4>[A-Z0-9\-]{5,})'
+    r'|date\s*:?\s*(?P<date1>\d{1,2}[/-]\d{1,2}[/-]\d{2,4})'
+    r'|invoice\s*date\s*:?\s*(?P<date2>\d{1,2}[/-]\d{1,2}[/-]\d{2,4})'
+    r'|(?P<date3>\d{1,2}[/-]\d{1,2}[/-]\d{4})'
+    r'|total\s*:?\s*\$?(?P<amt1>[0-9,]+\.\d{2})'
+    r'|amount\s*due\s*:?\s*\$?(?P<amt2>[0-9,]+\.\d{2})'
+    r'|grand\s*total\s*:?\s*\$?(?P<amt3>[0-9,]+\.\d{2})'
+    r'|balance\s*due\s*:?\s*\$?(?P<amt4>[0-9,]+\.\d{2})'
+    r'|tax\s*:?\s*\$?(?P<tax1>[0-9,]+\.\d{2})'
+    r'|vat\s*:?\s*\$?(?P<tax2>[0-9,]+\.\d{2})'
+    r'|sales\s*tax\s*:?\s*\$?(?P<tax3>[0-9,]+\.\d{2})'
+    r'|from\s*:?\s*(?P<ven1>[A-Za-z0-9 \t&.,]+)(?:\n|\r)'
+    r'|vendor\s*:?\s*(?P<ven2>[A-Za-z0-9 \t&.,]+)(?:\n|\r)'
+    r'|billed\s*by\s*:?\s*(?P<ven3>[A-Za-z0-9 \t&.,]+)(?:\n|\r)',
+    re.IGNORECASE,
+)
+
+_GROUP_FIELD = {
+    'inv1': 'invoice_number', 'inv2': 'invoice_number',
+    'inv3': 'invoice_number', 'inv4': 'invoice_number',
+    'date1': 'date', 'date2': 'date', 'date3': 'date',
+    'amt1': 'total_amount', 'amt2': 'total_amount',
+    'amt3': 'total_amount', 'amt4': 'total_amount',
+    'tax1': 'tax_amount', 'tax2': 'tax_amount', 'tax3': 'tax_amount',
+    'ven1': 'vendor', 'ven2': 'vendor', 'ven3': 'vendor',
+}
+
+_AMOUNT_FIELDS = frozenset(('total_amount', 'tax_amount'))
+
 
 class InvoiceParser:
     """Invoice data extraction and parsing"""
@@ -27,18 +122,67 @@ class InvoiceParser:
         Returns:
             Dictionary containing parsed invoice data
         """
+        fields = self._scan_fields(text)
         invoice_data = {
-            'invoice_number': self.extract_invoice_number(text),
-            'date': self.extract_date(text),
-            'total_amount': self.extract_total_amount(text),
-            'vendor': self.extract_vendor(text),
+            'invoice_number': fields.get('invoice_number'),
+            'date': fields.get('date'),
+            'total_amount': fields.get('total_amount'),
+            'vendor': fields.get('vendor') or self.extract_vendor(text),
             'items': self.extract_line_items(text),
-            'tax_amount': self.extract_tax(text),
+            'tax_amount': fields.get('tax_amount'),
             'currency': self.extract_currency(text)
         }
-        
+
         self.logger.info(f"Parsed invoice: {invoice_data['invoice_number']}")
         return invoice_data
+
+    def parse_invoices(self, texts: List[str]) -> List[Dict]:
+        """Parse a batch of invoices in parallel across CPU cores
+
+        Parsing is pure and per-document, so large batches are spread over
+        a process pool; the module-level patterns compile once per worker
+        at import. Small batches are parsed inline to skip pool startup.
+
+        Args:
+            texts: Extracted invoice texts
+
+        Returns:
+            List of parsed invoice dictionaries, in input order
+        """
+        if len(texts) < 2:
+            return [self.parse_invoice(text) for text in texts]
+
+        workers = os.cpu_count() or 1
+        chunksize = max(1, len(texts) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_parse_invoice_worker, texts, chunksize=chunksize))
+
+    def _scan_fields(self, text: str) -> Dict:
+        """Extract all scalar fields in a single pass over the text
+
+        Args:
+            text: Invoice text
+
+        Returns:
+            Dictionary of field name to extracted value
+        """
+        fields = {}
+
+        for match in _FUSED_FIELDS.finditer(text):
+            field = _GROUP_FIELD[match.lastgroup]
+            if field in fields:
+                continue
+            value = match.group(match.lastgroup).strip()
+            if field in _AMOUNT_FIELDS:
+                try:
+                    value = float(value.replace(',', ''))
+                except ValueError:
+                    continue
+            fields[field] = value
+            if len(fields) == 5:
+                break
+
+        return fields
     
     def extract_invoice_number(self, text: str) -> Optional[str]:
         """Extract invoice number from text
@@ -49,18 +193,11 @@ class InvoiceParser:
         Returns:
             Invoice number or None
         """
-        patterns = [
-            r'invoice\s*#?\s*:?\s*([A-Z0-9\-]+)',
-            r'inv\s*#?\s*:?\s*([A-Z0-9\-]+)',
-            r'invoice\s*number\s*:?\s*([A-Z0-9\-]+)',
-            r'#\s*([A-Z0-9\-]{5,})'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in _INVOICE_NUMBER_PATTERNS:
+            match = pattern.search(text)
             if match:
                 return match.group(1).strip()
-        
+
         return None
     
     def extract_date(self, text: str) -> Optional[str]:
@@ -72,17 +209,11 @@ class InvoiceParser:
         Returns:
             Date string or None
         """
-        patterns = [
-            r'date\s*:?\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-            r'invoice\s*date\s*:?\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-            r'(\d{1,2}[/-]\d{1,2}[/-]\d{4})'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in _DATE_PATTERNS:
+            match = pattern.search(text)
             if match:
                 return match.group(1).strip()
-        
+
         return None
     
     def extract_total_amount(self, text: str) -> Optional[float]:
@@ -94,15 +225,8 @@ class InvoiceParser:
         Returns:
             Total amount as float or None
         """
-        patterns = [
-            r'total\s*:?\s*\$?([0-9,]+\.\d{2})',
-            r'amount\s*due\s*:?\s*\$?([0-9,]+\.\d{2})',
-            r'grand\s*total\s*:?\s*\$?([0-9,]+\.\d{2})',
-            r'balance\s*due\s*:?\s*\$?([0-9,]+\.\d{2})'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in _TOTAL_PATTERNS:
+            match = pattern.search(text)
             if match:
                 amount_str = match.group(1).replace(',', '')
                 try:
@@ -121,14 +245,8 @@ class InvoiceParser:
         Returns:
             Vendor name or None
         """
-        patterns = [
-            r'from\s*:?\s*([A-Za-z0-9\s&.,]+)(?:\n|\r)',
-            r'vendor\s*:?\s*([A-Za-z0-9\s&.,]+)(?:\n|\r)',
-            r'billed\s*by\s*:?\s*([A-Za-z0-9\s&.,]+)(?:\n|\r)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in _VENDOR_PATTERNS:
+            match = pattern.search(text)
             if match:
                 return match.group(1).strip()
         
@@ -148,20 +266,14 @@ class InvoiceParser:
         Returns:
             List of line item dictionaries
         """
-        items = []
-        
-        # Pattern for line items (simplified)
-        pattern = r'([A-Za-z0-9\s\-]+)\s+(\d+)\s+\$?([0-9,]+\.\d{2})'
-        
-        matches = re.finditer(pattern, text)
-        for match in matches:
-            items.append({
+        return [
+            {
                 'description': match.group(1).strip(),
                 'quantity': int(match.group(2)),
-                'amount': float(match.group(3).replace(',', ''))
-            })
-        
-        return items
+                'amount': float(match.group(3).translate(_DECOMMA))
+            }
+            for match in _LINE_ITEM_PATTERN.finditer(text)
+        ]
     
     def extract_tax(self, text: str) -> Optional[float]:
         """Extract tax amount from text
@@ -172,14 +284,8 @@ class InvoiceParser:
         Returns:
             Tax amount as float or None
         """
-        patterns = [
-            r'tax\s*:?\s*\$?([0-9,]+\.\d{2})',
-            r'vat\s*:?\s*\$?([0-9,]+\.\d{2})',
-            r'sales\s*tax\s*:?\s*\$?([0-9,]+\.\d{2})'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in _TAX_PATTERNS:
+            match = pattern.search(text)
             if match:
                 amount_str = match.group(1).replace(',', '')
                 try:
@@ -198,20 +304,13 @@ class InvoiceParser:
         Returns:
             Currency code (defaults to 'USD')
         """
-        currencies = ['USD', 'EUR', 'GBP', 'CAD', 'AUD']
-        
-        for currency in currencies:
-            if currency in text.upper():
-                return currency
-        
-        # Check for currency symbols
-        if '$' in text:
-            return 'USD'
-        elif '€' in text:
-            return 'EUR'
-        elif '£' in text:
-            return 'GBP'
-        
+        match = _CURRENCY_PATTERN.search(text)
+        if match:
+            code = match.group(1)
+            if code:
+                return code.upper()
+            return _SYMBOL_CURRENCY[match.group(2)]
+
         return 'USD'  # Default
     
     def validate_invoice_data(self, invoice_data: Dict) -> bool:
@@ -243,8 +342,12 @@ class InvoiceParser:
             True if successful
         """
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(invoice_data, f, indent=2, default=str)
+            if orjson is not None:
+                with open(filepath, 'wb') as f:
+                    f.write(orjson.dumps(invoice_data, option=orjson.OPT_INDENT_2, default=str))
+            else:
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    json.dump(invoice_data, f, indent=2, default=str)
             self.logger.info(f"Saved invoice data to {filepath}")
             return True
         except Exception as e:
@@ -252,6 +355,20 @@ class InvoiceParser:
             return False
 
 
+# Parser reused across calls within one worker process; InvoiceParser holds
+# no per-document state, so construction happens once per process rather
+# than once per text
+_worker_parser: Optional[InvoiceParser] = None
+
+
+def _parse_invoice_worker(text: str) -> Dict:
+    """Module-level entry point for ProcessPoolExecutor workers"""
+    global _worker_parser
+    if _worker_parser is None:
+        _worker_parser = InvoiceParser()
+    return _worker_parser.parse_invoice(text)
+
+
 if __name__ == '__main__':
     # Test the invoice parser
     logging.basicConfig(level=logging.INFO)
@@ -0,0 +1,82 @@
+"""Background File Writer Module
+
+Batches small-file writes onto a dedicated writer thread so the email
+processing loop is not blocked on per-file open/write/close latency.
+"""
+
+import functools
+import logging
+import os
+import queue
+import threading
+from typing import Optional, Union
+
+
+class BatchFileWriter:
+    """Queue-backed file writer running on a daemon thread"""
+
+    _SENTINEL = object()
+
+    def __init__(self, max_queue: int = 256):
+        """Initialize the writer and start its worker thread
+
+        Args:
+            max_queue: Maximum number of pending writes before submit blocks
+        """
+        self.logger = logging.getLogger(__name__)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(
+            target=self._run,
+            name='batch-file-writer',
+            daemon=True
+        )
+        self._thread.start()
+
+    def submit_write(self, path: str, data: Union[bytes, str], dir_fd: Optional[int] = None):
+        """Queue one file write and return immediately
+
+        Write errors are logged from the worker thread rather than raised
+        to the caller.
+
+        Args:
+            path: Destination file path (a bare name when dir_fd is given)
+            data: File contents (bytes written binary, str written utf-8)
+            dir_fd: Optional directory fd to resolve path against, skipping
+                the full path walk in the kernel
+        """
+        self._queue.put((path, data, dir_fd))
+
+    def flush(self):
+        """Block until every queued write has been handed to the filesystem"""
+        self._queue.join()
+
+    def close(self):
+        """Flush pending writes and stop the worker thread"""
+        self.flush()
+        self._queue.put(self._SENTINEL)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is self._SENTINEL:
+                    return
+                path, data, dir_fd = item
+                opener = None
+                if dir_fd is not None:
+                    opener = functools.partial(self._openat, dir_fd)
+                if isinstance(data, bytes):
+                    with open(path, 'wb', opener=opener) as f:
+                        f.write(data)
+                else:
+                    with open(path, 'w', encoding='utf-8', opener=opener) as f:
+                        f.write(data)
+            except Exception as e:
+                self.logger.error(f"Error writing {item[0]}: {e}")
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    def _openat(dir_fd: int, path: str, flags: int) -> int:
+        return os.open(path, flags, 0o644, dir_fd=dir_fd)
@@ -5,27 +5,44 @@ IMAP Email Filter with PDF OCR - Main application that coordinates
 email fetching, PDF processing, OCR, and data extraction.
 """
 
+import atexit
 import logging
+import queue
 import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
 
 from config import IMAPConfig, AppConfig, validate_config
 from email_client import EmailClient
-from pdf_processor import PDFProcessor
+from pdf_processor import PDFProcessor, create_ocr_pool
 from invoice_parser import InvoiceParser
 from data_manager import DataManager
 
 
 def setup_logging():
-    """Setup logging configuration"""
-    logging.basicConfig(
-        level=getattr(logging, AppConfig.LOG_LEVEL),
-        format=AppConfig.LOG_FORMAT,
-        handlers=[
-            logging.FileHandler(AppConfig.LOG_FILE),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+    """Setup logging configuration
+
+    Workers log through a QueueHandler, so a log call in the OCR hot
+    path only enqueues the record; a single QueueListener thread drains
+    the queue to the file and stdout handlers. Without this, the file
+    handler's lock serializes the worker threads on disk writes.
+    """
+    formatter = logging.Formatter(AppConfig.LOG_FORMAT)
+    file_handler = logging.FileHandler(AppConfig.LOG_FILE)
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(-1)
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, AppConfig.LOG_LEVEL))
+    root.addHandler(QueueHandler(log_queue))
+
+    listener = QueueListener(log_queue, file_handler, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
 
 
 class EmailFilterApp:
@@ -35,12 +52,20 @@ class EmailFilterApp:
         """Initialize the application"""
         self.logger = logging.getLogger(__name__)
         self.email_client = EmailClient()
-        self.pdf_processor = PDFProcessor()
+        # One warm OCR worker pool for the whole run; workers spawn on
+        # first use and are reused across every PDF
+        self.ocr_pool = create_ocr_pool()
+        self.pdf_processor = PDFProcessor(ocr_pool=self.ocr_pool)
         self.invoice_parser = InvoiceParser()
         self.data_manager = DataManager()
         
         self.processed_count = 0
         self.failed_count = 0
+        # imaplib connections are not thread-safe: every IMAP command from
+        # worker threads goes through this lock, while OCR/parse/save work
+        # runs outside it and overlaps freely
+        self._imap_lock = threading.Lock()
+        self._count_lock = threading.Lock()
     
     def run(self):
         """Main application run method"""
@@ -65,10 +90,30 @@ class EmailFilterApp:
                 self.logger.info("No unread emails to process")
                 return True
             
-            # Process each email
-            for email_id in email_ids:
-                self.process_email(email_id)
+            # Pull all message bodies down in batched FETCH round-trips
+            # first — one RTT per chunk instead of one per message — then
+            # fan the parsed messages out to the workers
+            with self._imap_lock:
+                messages = self.email_client.fetch_emails(email_ids)
+
+            missing = len(email_ids) - len(messages)
+            if missing:
+                self.logger.warning(f"Could not fetch {missing} emails")
+                with self._count_lock:
+                    self.failed_count += missing
+
+            # Process emails concurrently: while one worker runs OCR on a
+            # page, another is already parsing the next message
+            with ThreadPoolExecutor(max_workers=AppConfig.MAX_WORKERS) as executor:
+                list(executor.map(
+                    lambda item: self.process_fetched_email(*item),
+                    messages.items()
+                ))
             
+            # Settle queued background writes before reporting, so the
+            # summary only ever describes output that is actually on disk
+            self.data_manager.flush_pending_writes()
+
             # Create summary report
             self.data_manager.create_summary_report(
                 self.processed_count,
@@ -84,24 +129,35 @@ class EmailFilterApp:
         
         finally:
             self.email_client.disconnect()
+            self.ocr_pool.shutdown()
             self.data_manager.cleanup_temp_files()
     
     def process_email(self, email_id: bytes):
-        """Process a single email
-        
+        """Fetch and process a single email
+
         Args:
             email_id: Email ID to process
         """
-        try:
-            self.logger.info(f"Processing email {email_id.decode()}")
-            
-            # Fetch email
+        with self._imap_lock:
             email_msg = self.email_client.fetch_email(email_id)
-            if not email_msg:
-                self.logger.warning(f"Could not fetch email {email_id}")
+        if not email_msg:
+            self.logger.warning(f"Could not fetch email {email_id}")
+            with self._count_lock:
                 self.failed_count += 1
-                return
-            
+            return
+
+        self.process_fetched_email(email_id, email_msg)
+
+    def process_fetched_email(self, email_id: bytes, email_msg):
+        """Process an already-fetched email message
+
+        Args:
+            email_id: Email ID the message was fetched under
+            email_msg: Parsed email message object
+        """
+        try:
+            self.logger.info(f"Processing email {email_id.decode()}")
+
             # Get email metadata
             metadata = self.email_client.get_email_metadata(email_msg)
             self.logger.info(f"Processing email from: {metadata['from']}")
@@ -112,7 +168,8 @@ class EmailFilterApp:
             
             if not attachments:
                 self.logger.info(f"No PDF attachments found in email {email_id}")
-                self.email_client.mark_as_read(email_id)
+                with self._imap_lock:
+                    self.email_client.mark_as_read(email_id)
                 return
             
             # Process each attachment
@@ -120,12 +177,15 @@ class EmailFilterApp:
                 self.process_attachment(attachment, metadata)
             
             # Mark email as read
-            self.email_client.mark_as_read(email_id)
-            self.processed_count += 1
-            
+            with self._imap_lock:
+                self.email_client.mark_as_read(email_id)
+            with self._count_lock:
+                self.processed_count += 1
+
         except Exception as e:
             self.logger.error(f"Error processing email {email_id}: {e}")
-            self.failed_count += 1
+            with self._count_lock:
+                self.failed_count += 1
     
     def process_attachment(self, attachment: Dict, email_metadata: Dict):
         """Process a PDF attachment
@@ -136,7 +196,8 @@ class EmailFilterApp:
         """
         try:
             filename = attachment['filename']
-            pdf_data = attachment['payload']
+            # Decode happens here, only for attachments that reach processing
+            pdf_data = attachment['payload_fn']()
             
             self.logger.info(f"Processing attachment: {filename}")
             
@@ -145,7 +206,9 @@ class EmailFilterApp:
                 self.logger.warning(f"Invalid PDF: {filename}")
                 return
             
-            # Save original PDF
+            # Save original PDF; the write is queued to the background
+            # writer thread, so it overlaps the extraction below instead
+            # of serializing ahead of it
             if AppConfig.SAVE_RAW_EMAILS:
                 self.data_manager.save_pdf(pdf_data, filename)
             
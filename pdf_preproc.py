@@ -0,0 +1,49 @@
+"""PDF Image Preprocessing Module
+
+Single-pass pixel kernels for cleaning page images before OCR.
+Implemented on NumPy buffers rather than PIL point operations, which
+run a Python-level call per pixel; when numba is installed the kernel
+is JIT-compiled and parallelized across rows.
+"""
+
+import numpy as np
+from PIL import Image
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _binarize_kernel(img, thresh):
+        # Plain compare-and-select per pixel keeps the loop branch-free
+        # enough for LLVM to auto-vectorize; rows fan out across cores
+        height, width = img.shape
+        out = np.empty((height, width), dtype=np.uint8)
+        for y in prange(height):
+            for x in range(width):
+                out[y, x] = 255 if img[y, x] > thresh else 0
+        return out
+else:
+    def _binarize_kernel(img, thresh):
+        return np.multiply(img > thresh, 255, dtype=np.uint8)
+
+
+def binarize_image(image: Image.Image, thresh: int = 180) -> Image.Image:
+    """Binarize a grayscale page image in one pass
+
+    Crushes scanner background noise to white and text to black, which
+    both shrinks the data tesseract sees and improves its segmentation
+    on low-contrast scans.
+
+    Args:
+        image: Grayscale ('L' mode) page image
+        thresh: Pixel values above this become white, others black
+
+    Returns:
+        Binarized 'L' mode image
+    """
+    arr = np.asarray(image, dtype=np.uint8)
+    return Image.fromarray(_binarize_kernel(arr, thresh), 'L')
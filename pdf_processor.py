@@ -4,30 +4,180 @@ This module handles PDF file processing, text extraction,
 and OCR functionality for scanned documents.
 """
 
-import pdfplumber
-import pytesseract
-from PIL import Image
-from pdf2image import convert_from_bytes
 import logging
-from typing import List, Dict, Optional
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from typing import List, Dict, Optional, Tuple
+import hashlib
 import io
+import json
 import os
+import re
+import shutil
 
 from config import OCRConfig, AppConfig
 
+# The PDF/OCR stack (MuPDF, pdfplumber's pdfminer machinery, PIL,
+# pytesseract) costs hundreds of ms of import time and tens of MB of
+# RSS. Each dependency loads on first use through a cached getter, so
+# runs that never reach that code path never pay for it.
+_fitz = None
+_pdfplumber = None
+_pytesseract = None
+_pil_image = None
+_pypdf_reader = None
+# False = not probed yet, None = probed and unavailable (both optional)
+_tesserocr = False
+_binarize_image = False
+
+
+def _get_fitz():
+    global _fitz
+    if _fitz is None:
+        import fitz as _fitz
+    return _fitz
+
+
+def _get_pdfplumber():
+    global _pdfplumber
+    if _pdfplumber is None:
+        import pdfplumber as _pdfplumber
+    return _pdfplumber
+
+
+def _get_pytesseract():
+    global _pytesseract
+    if _pytesseract is None:
+        import pytesseract as _pytesseract
+        resolved = _resolve_tesseract(OCRConfig.TESSERACT_PATH)
+        if resolved:
+            _pytesseract.pytesseract.tesseract_cmd = resolved
+    return _pytesseract
+
+
+@lru_cache(maxsize=1)
+def _resolve_tesseract(configured_path: Optional[str]) -> Optional[str]:
+    """Resolve the tesseract binary once per process
+
+    Every PDFProcessor (and every pool worker) used to stat the
+    configured path again; the answer cannot change mid-run, so cache
+    it. Falls back to whatever is on PATH when the configured location
+    does not exist.
+    """
+    if configured_path and os.path.exists(configured_path):
+        return configured_path
+    return shutil.which('tesseract')
+
+
+@lru_cache(maxsize=1)
+def _available_languages() -> frozenset:
+    """Probe tesseract's installed language packs once per process
+
+    An empty set means the probe itself failed, in which case callers
+    should not draw conclusions about any particular language.
+    """
+    try:
+        return frozenset(_get_pytesseract().get_languages(config=''))
+    except Exception:
+        return frozenset()
+
+
+def _get_pil_image():
+    global _pil_image
+    if _pil_image is None:
+        from PIL import Image as _pil_image
+    return _pil_image
+
+
+def _get_pdf_reader():
+    global _pypdf_reader
+    if _pypdf_reader is None:
+        from pypdf import PdfReader as _pypdf_reader
+    return _pypdf_reader
+
+
+def _get_tesserocr():
+    """A preloaded tesserocr engine is optional; None when not installed"""
+    global _tesserocr
+    if _tesserocr is False:
+        try:
+            import tesserocr as _tesserocr
+        except ImportError:
+            _tesserocr = None
+    return _tesserocr
+
+
+def _get_binarize():
+    """NumPy-backed binarization is optional; None when numpy is missing"""
+    global _binarize_image
+    if _binarize_image is False:
+        try:
+            from pdf_preproc import binarize_image as _binarize_image
+        except ImportError:
+            _binarize_image = None
+    return _binarize_image
+
+
+# LSTM engine only (skips legacy engine init), uniform-block page
+# segmentation (right for invoices, skips layout hypotheses tesseract
+# would otherwise try), and no inverted-text detection pass
+_OCR_CONFIG = '--oem 1 --psm 6 -c tessedit_do_invert=0'
+
+
+def _init_ocr_worker():
+    """Keep tesseract single-threaded inside each pool worker
+
+    One worker per core already saturates the machine; letting each
+    tesseract spin up its own OpenMP threads on top oversubscribes it.
+    """
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+
+
+def create_ocr_pool() -> ProcessPoolExecutor:
+    """Build a process pool configured for OCR page workers
+
+    Meant to be created once per run and shared across documents, so
+    worker processes (and the libraries they import) stay warm instead
+    of being forked and torn down for every PDF. The caller owns
+    shutdown.
+    """
+    return ProcessPoolExecutor(
+        max_workers=os.cpu_count(),
+        initializer=_init_ocr_worker
+    )
+
+
+def _ocr_page(png_bytes: bytes, lang: str) -> str:
+    """OCR a single page image in a pool worker
+
+    Takes PNG bytes rather than a PIL Image so the argument pickles
+    cheaply across the process boundary.
+    """
+    image = _get_pil_image().open(io.BytesIO(png_bytes))
+    return _get_pytesseract().image_to_string(
+        image, lang=lang, config=_OCR_CONFIG
+    )
+
 
 class PDFProcessor:
     """PDF processing and OCR handler"""
     
-    def __init__(self):
-        """Initialize PDF processor with configuration"""
+    def __init__(self, ocr_pool: Optional[ProcessPoolExecutor] = None):
+        """Initialize PDF processor with configuration
+
+        Args:
+            ocr_pool: Optional long-lived pool from create_ocr_pool;
+                when given, page OCR reuses its warm workers instead of
+                spinning up a pool per document
+        """
         self.logger = logging.getLogger(__name__)
         self.tesseract_path = OCRConfig.TESSERACT_PATH
         self.dpi = OCRConfig.DPI
-        
-        # Set tesseract path if configured
-        if self.tesseract_path and os.path.exists(self.tesseract_path):
-            pytesseract.pytesseract.tesseract_cmd = self.tesseract_path
+        self.ocr_pool = ocr_pool
+        self.cache_dir = AppConfig.CACHE_DIR
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # The configured tesseract path is applied inside _get_pytesseract
+        # on first OCR use, so constructing a processor stays cheap
     
     def extract_text_from_pdf(self, pdf_data: bytes, filename: str = "") -> Dict:
         """Extract text from PDF using multiple methods
@@ -46,120 +196,350 @@ class PDFProcessor:
             'page_count': 0,
             'success': False
         }
-        
+
+        # Resent invoices and duplicate deliveries carry byte-identical
+        # PDFs; a cache hit skips both the pdfplumber parse and OCR
+        cache_path = os.path.join(
+            self.cache_dir, f"{self._cache_key(pdf_data)}.json"
+        )
+        cached = self._cache_load(cache_path)
+        if cached is not None:
+            cached['filename'] = filename
+            self.logger.info(f"Extraction cache hit for {filename}")
+            return cached
+
         try:
-            # First try pdfplumber (works for digital PDFs)
-            text = self._extract_with_pdfplumber(pdf_data)
-            
+            # Scanned invoices have no fonts anywhere in the document, so
+            # a text-extraction pass would only confirm there is no text;
+            # skip it and go straight to OCR for those
+            text = ''
+            method = 'none'
+            page_count = 0
+            if self._has_text_operators(pdf_data):
+                # MuPDF's C-level text walker is the fast path for
+                # digital PDFs; pdfplumber's layout-aware (and far
+                # slower) parse only runs when fitz comes back thin
+                text, page_count = self._extract_with_fitz(pdf_data)
+                method = 'fitz'
+                if len(text) < 50:
+                    text, page_count = self._extract_with_pdfplumber(pdf_data)
+                    method = 'pdfplumber'
+
             if text and len(text.strip()) > 50:  # Threshold for meaningful text
                 result['text'] = text
-                result['method'] = 'pdfplumber'
+                result['method'] = method
+                result['page_count'] = page_count
                 result['success'] = True
-                self.logger.info(f"Extracted text from {filename} using pdfplumber")
+                self.logger.info(f"Extracted text from {filename} using {method}")
             else:
                 # Fall back to OCR for scanned documents
                 self.logger.info(f"Attempting OCR for {filename}")
-                text = self._extract_with_ocr(pdf_data)
+                text, page_count = self._extract_with_ocr(pdf_data)
                 result['text'] = text
                 result['method'] = 'ocr'
+                result['page_count'] = page_count
                 result['success'] = bool(text)
                 
         except Exception as e:
             self.logger.error(f"Error extracting text from {filename}: {e}")
             result['error'] = str(e)
-        
+
+        if result['success']:
+            self._cache_store(cache_path, result)
+
         return result
-    
-    def _extract_with_pdfplumber(self, pdf_data: bytes) -> str:
-        """Extract text using pdfplumber (for digital PDFs)
-        
+
+    def _cache_key(self, pdf_data: bytes) -> str:
+        """Fingerprint a PDF plus the settings that shape its extraction
+
+        blake2b is considerably faster than MD5/SHA on multi-MB inputs.
+        DPI and OCR language are folded in so changing either invalidates
+        old entries instead of serving stale text.
+        """
+        h = hashlib.blake2b(pdf_data, digest_size=16)
+        h.update(f"{self.dpi}:{OCRConfig.TESSERACT_LANG}".encode())
+        return h.hexdigest()
+
+    def _cache_load(self, cache_path: str) -> Optional[Dict]:
+        """Return a cached extraction result, or None on miss"""
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable cache entry: {e}")
+            return None
+
+    def _cache_store(self, cache_path: str, result: Dict):
+        """Persist an extraction result, atomically via rename"""
+        tmp_path = f"{cache_path}.tmp{os.getpid()}"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            self.logger.warning(f"Could not write extraction cache: {e}")
+
+    def _has_text_operators(self, pdf_data: bytes) -> bool:
+        """Check cheaply whether any page declares a font
+
+        Uses pypdf, which reads the object graph lazily, so this is far
+        cheaper than a pdfplumber open. A page with no font resources
+        cannot draw text, so a document with none anywhere is pure raster
+        and only OCR can help.
+        """
+        try:
+            reader = _get_pdf_reader()(io.BytesIO(pdf_data))
+            for page in reader.pages:
+                resources = page.get('/Resources')
+                if resources and '/Font' in resources:
+                    return True
+            return False
+        except Exception as e:
+            # On any parse hiccup, let the full extraction path decide
+            self.logger.warning(f"PDF pre-scan failed: {e}")
+            return True
+
+    def _extract_with_fitz(self, pdf_data: bytes) -> Tuple[str, int]:
+        """Extract text with MuPDF (fast path for digital PDFs)
+
+        A single C-level pass per page, orders of magnitude faster than
+        the pdfminer machinery under pdfplumber.
+
         Args:
             pdf_data: PDF file as bytes
-            
+
         Returns:
-            Extracted text string
+            Tuple of (extracted text, page count) from the one open
         """
-        text = ''
-        
-        with pdfplumber.open(io.BytesIO(pdf_data)) as pdf:
+        with _get_fitz().open(stream=pdf_data, filetype='pdf') as doc:
+            text = '\n'.join(page.get_text('text') for page in doc).strip()
+            return text, doc.page_count
+
+    def _extract_with_pdfplumber(self, pdf_data: bytes) -> Tuple[str, int]:
+        """Extract text using pdfplumber (layout-sensitive fallback)
+
+        Args:
+            pdf_data: PDF file as bytes
+
+        Returns:
+            Tuple of (extracted text, page count) from the one open
+        """
+        # Accumulate per-page strings and join once; += re-copies the
+        # whole accumulated text per page, which is quadratic on long PDFs
+        parts = []
+
+        with _get_pdfplumber().open(io.BytesIO(pdf_data)) as pdf:
+            page_count = len(pdf.pages)
             for page in pdf.pages:
                 page_text = page.extract_text()
                 if page_text:
-                    text += page_text + '\n'
-        
-        return text.strip()
+                    parts.append(page_text)
+
+        return '\n'.join(parts).strip(), page_count
     
-    def _extract_with_ocr(self, pdf_data: bytes) -> str:
+    def _extract_with_ocr(self, pdf_data: bytes) -> Tuple[str, int]:
         """Extract text using OCR (for scanned PDFs)
-        
+
         Args:
             pdf_data: PDF file as bytes
-            
+
         Returns:
-            Extracted text string
+            Tuple of (extracted text, page count)
         """
-        text = ''
-        
         try:
-            # Convert PDF pages to images
-            images = convert_from_bytes(
-                pdf_data,
-                dpi=self.dpi,
-                fmt=OCRConfig.IMAGE_FORMAT
-            )
-            
-            # Perform OCR on each page
-            for i, image in enumerate(images):
-                self.logger.info(f"Processing page {i+1} with OCR")
-                page_text = pytesseract.image_to_string(
-                    image,
-                    lang=OCRConfig.TESSERACT_LANG
+            # Surface a missing language pack once, up front, instead of
+            # letting every page's tesseract call fail with it
+            languages = _available_languages()
+            if languages and OCRConfig.TESSERACT_LANG not in languages:
+                self.logger.warning(
+                    f"Tesseract language '{OCRConfig.TESSERACT_LANG}' "
+                    f"not in installed set {sorted(languages)}"
                 )
-                text += page_text + '\n'
-        
+
+            # Convert PDF pages to images
+            images = [
+                self._prepare_for_ocr(image)
+                for image in self._rasterize_pages(pdf_data)
+            ]
+
+            # Engine startup and model load dominate short OCR calls, so
+            # all pages go through one preloaded engine (tesserocr) or,
+            # failing that, fan out across the warm process pool, which
+            # amortizes startup over the run instead of paying it per page
+            self.logger.info(f"Running OCR on {len(images)} pages")
+            if _get_tesserocr() is not None:
+                texts = self._ocr_batch_tesserocr(images)
+            else:
+                texts = self._ocr_batch_parallel(images)
+
         except Exception as e:
             self.logger.error(f"OCR extraction failed: {e}")
             raise
-        
-        return text.strip()
-    
-    def extract_images_from_pdf(self, pdf_data: bytes) -> List[Image.Image]:
+
+        return '\n'.join(texts).strip(), len(images)
+
+    def _rasterize_pages(self, pdf_data: bytes) -> List['Image.Image']:
+        """Render PDF pages to grayscale images in-process with PyMuPDF
+
+        pdf2image forked a pdftoppm subprocess per call and round-tripped
+        every page through PNG encode/decode. MuPDF rasterizes straight
+        into a grayscale pixel buffer that PIL wraps directly — no
+        subprocess, no intermediate image format.
+
+        Args:
+            pdf_data: PDF file as bytes
+
+        Returns:
+            List of 'L' mode page images at the configured DPI
+        """
+        fitz = _get_fitz()
+        pil = _get_pil_image()
+        zoom = self.dpi / 72
+        matrix = fitz.Matrix(zoom, zoom)
+        images = []
+        with fitz.open(stream=pdf_data, filetype='pdf') as doc:
+            for page in doc:
+                pix = page.get_pixmap(
+                    matrix=matrix,
+                    colorspace=fitz.csGRAY,
+                    alpha=False
+                )
+                images.append(
+                    pil.frombytes('L', (pix.width, pix.height), pix.samples)
+                )
+        return images
+
+    # Pages above this pixel count are downsampled before OCR; tesseract
+    # throughput scales inversely with pixels and printed invoice text
+    # stays fully legible well below 300 DPI
+    _MAX_OCR_PIXELS = 6_000_000
+
+    # Grayscale values above this binarize to white background
+    _BINARIZE_THRESHOLD = 180
+
+    def _prepare_for_ocr(self, image: 'Image.Image') -> 'Image.Image':
+        """Normalize a page image to grayscale and cap its pixel count
+
+        Args:
+            image: Rendered page image
+
+        Returns:
+            Grayscale image, downsampled if it exceeded the pixel cap
+        """
+        if image.mode != 'L':
+            image = image.convert('L')
+        pixels = image.width * image.height
+        if pixels > self._MAX_OCR_PIXELS:
+            # Scale both axes by the ratio that lands exactly on the cap;
+            # a fixed shrink factor leaves very large scans over it
+            scale = (self._MAX_OCR_PIXELS / pixels) ** 0.5
+            image.thumbnail(
+                (int(image.width * scale), int(image.height * scale)),
+                _get_pil_image().LANCZOS
+            )
+        binarize_image = _get_binarize()
+        if binarize_image is not None:
+            image = binarize_image(image, self._BINARIZE_THRESHOLD)
+        return image
+
+    def _ocr_batch_tesserocr(self, images: List['Image.Image']) -> List[str]:
+        """OCR pages through one preloaded tesserocr engine
+
+        Args:
+            images: Page images to recognize
+
+        Returns:
+            List of per-page text strings
+        """
+        texts = []
+        tesserocr = _get_tesserocr()
+        with tesserocr.PyTessBaseAPI(
+            lang=OCRConfig.TESSERACT_LANG,
+            psm=tesserocr.PSM.SINGLE_BLOCK,
+            oem=tesserocr.OEM.LSTM_ONLY
+        ) as api:
+            for image in images:
+                api.SetImage(image)
+                texts.append(api.GetUTF8Text())
+        return texts
+
+    def _ocr_batch_parallel(self, images: List['Image.Image']) -> List[str]:
+        """OCR pages across CPU cores with a process pool
+
+        Page OCR is compute-bound and pages are independent, so each page
+        is serialized to PNG bytes and recognized in a separate worker
+        process; single-page documents skip the pool entirely.
+
+        Args:
+            images: Page images to recognize
+
+        Returns:
+            List of per-page text strings, in page order
+        """
+        if len(images) == 1:
+            return [_get_pytesseract().image_to_string(
+                images[0],
+                lang=OCRConfig.TESSERACT_LANG,
+                config=_OCR_CONFIG
+            )]
+
+        page_bytes = []
+        for image in images:
+            buf = io.BytesIO()
+            image.save(buf, 'PNG')
+            page_bytes.append(buf.getvalue())
+
+        ocr = partial(_ocr_page, lang=OCRConfig.TESSERACT_LANG)
+        if self.ocr_pool is not None:
+            return list(self.ocr_pool.map(ocr, page_bytes))
+
+        with create_ocr_pool() as pool:
+            return list(pool.map(ocr, page_bytes))
+
+    def extract_images_from_pdf(self, pdf_data: bytes) -> List['Image.Image']:
         """Extract images from PDF
-        
+
+        Pulls each embedded image's already-compressed stream straight
+        out of the file with MuPDF — one C-level extract_image call per
+        xref — instead of re-decoding streams through pdfplumber's
+        page.images.
+
         Args:
             pdf_data: PDF file as bytes
-            
+
         Returns:
             List of PIL Image objects
         """
         images = []
-        
+
         if not OCRConfig.EXTRACT_IMAGES:
             return images
-        
+
         try:
-            with pdfplumber.open(io.BytesIO(pdf_data)) as pdf:
-                for page in pdf.pages:
-                    page_images = page.images
-    for img in page_images:
-                        # Extract and convert image data
+            pil = _get_pil_image()
+            with _get_fitz().open(stream=pdf_data, filetype='pdf') as doc:
+                for page in doc:
+                    for xref, *_ in page.get_images(full=True):
                         try:
-                            image = Image.open(io.BytesIO(img['stream'].get_data()))
-                            images.append(image)
+                            info = doc.extract_image(xref)
+                            images.append(pil.open(io.BytesIO(info['image'])))
                         except Exception as e:
                             self.logger.warning(f"Could not extract image: {e}")
-        
+
         except Exception as e:
             self.logger.error(f"Error extracting images: {e}")
-        
+
         return images
     
-    def validate_pdf(self, pdf_data: bytes) -> bool:
+    def validate_pdf(self, pdf_data) -> bool:
         """Validate PDF file
-        
+
         Args:
-            pdf_data: PDF file as bytes
-            
+            pdf_data: PDF file as bytes or any bytes-like buffer
+                (e.g. memoryview); nothing is copied either way
+
         Returns:
             True if valid PDF
         """
@@ -168,20 +548,73 @@ class PDFProcessor:
         if size_mb > OCRConfig.MAX_PDF_SIZE_MB:
             self.logger.warning(f"PDF exceeds max size: {size_mb:.2f}MB")
             return False
-        
-        # Check PDF signature
-        if not pdf_data.startswith(b'%PDF'):
+
+        # Check PDF signature; slicing works on both bytes and
+        # memoryview, unlike startswith
+        if bytes(pdf_data[:4]) != b'%PDF':
             self.logger.error("Invalid PDF signature")
             return False
-        
+
+        # Reject huge scans before any parse or OCR is attempted. The byte
+        # scan is only an estimate (an outline's /Count can land in the tail
+        # window too), so over-limit candidates are confirmed against
+        # pypdf's lazy page tree before the document is dropped
+        page_count = self.quick_page_count(pdf_data)
+        if page_count > OCRConfig.MAX_PDF_PAGES:
+            try:
+                reader = _get_pdf_reader()(io.BytesIO(pdf_data))
+                page_count = len(reader.pages)
+            except Exception as e:
+                # Never reject on the estimate alone; a real parse failure
+                # will surface in the extraction path itself
+                self.logger.warning(f"Page count confirmation failed: {e}")
+                return True
+            if page_count > OCRConfig.MAX_PDF_PAGES:
+                self.logger.warning(
+                    f"PDF has {page_count} pages, over limit "
+                    f"{OCRConfig.MAX_PDF_PAGES}"
+                )
+                return False
+
         return True
+
+    # The page tree's /Count lives in the trailing catalog region of
+    # most writers' output
+    _PAGE_COUNT_PATTERN = re.compile(rb'/Count\s+(\d+)')
+
+    def quick_page_count(self, pdf_data) -> int:
+        """Estimate the page count from raw bytes, without parsing
+
+        Scans the tail of the file for the page tree's /Count and falls
+        back to counting /Type /Page markers — O(filesize) byte scans,
+        no object-graph construction. Writers that pack everything into
+        compressed object streams hide both, in which case 0 is returned
+        and means 'unknown', not 'empty'.
+
+        Args:
+            pdf_data: PDF file as bytes or any bytes-like buffer
+
+        Returns:
+            Estimated page count, or 0 when it cannot be determined
+        """
+        counts = self._PAGE_COUNT_PATTERN.findall(bytes(pdf_data[-8192:]))
+        if counts:
+            # Outlines carry /Count too; the page tree's is the largest
+            return max(int(c) for c in counts)
+
+        raw = bytes(pdf_data)
+        return raw.count(b'/Type /Page') - raw.count(b'/Type /Pages')
     
     def get_pdf_metadata(self, pdf_data: bytes) -> Dict:
         """Extract PDF metadata
-        
+
+        Note that extract_text_from_pdf already reports page_count from
+        its own parse; only call this when the document info dictionary
+        is actually needed.
+
         Args:
             pdf_data: PDF file as bytes
-            
+
         Returns:
             Dictionary containing PDF metadata
         """
@@ -190,24 +623,26 @@ class PDFProcessor:
             'size_bytes': len(pdf_data),
             'size_mb': round(len(pdf_data) / (1024 * 1024), 2)
         }
-        
+
         try:
-            with pdfplumber.open(io.BytesIO(pdf_data)) as pdf:
-                metadata['page_count'] = len(pdf.pages)
-                
-                if pdf.metadata:
-                    metadata.update({
-                        'title': pdf.metadata.get('Title', ''),
-                        'author': pdf.metadata.get('Author', ''),
-                        'subject': pdf.metadata.get('Subject', ''),
-                        'creator': pdf.metadata.get('Creator', ''),
-                        'producer': pdf.metadata.get('Producer', ''),
-                        'creation_date': pdf.metadata.get('CreationDate', '')
-                    })
-        
+            # MuPDF opens lazily, so reading the info dictionary does not
+            # pay for a full pdfplumber-style object-graph parse
+            with _get_fitz().open(stream=pdf_data, filetype='pdf') as doc:
+                metadata['page_count'] = doc.page_count
+
+                info = doc.metadata or {}
+                metadata.update({
+                    'title': info.get('title', ''),
+                    'author': info.get('author', ''),
+                    'subject': info.get('subject', ''),
+                    'creator': info.get('creator', ''),
+                    'producer': info.get('producer', ''),
+                    'creation_date': info.get('creationDate', '')
+                })
+
         except Exception as e:
             self.logger.error(f"Error extracting PDF metadata: {e}")
-        
+
         return metadata
     
     def save_text_to_file(self, text: str, output_path: str) -> bool: